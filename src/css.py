@@ -1,22 +1,97 @@
 import re
+from operator import attrgetter, itemgetter
+
+# Characters allowed in identifiers. A frozenset membership test is a single
+# O(1) hash lookup, much cheaper than re-entering the regex engine per char.
+_IDENT_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789_-")
+
+# Precompiled span patterns for the common consume loops. A single C-level
+# regex scan replaces one Python-level predicate call per character.
+_RE_IDENT = re.compile(r'[A-Za-z0-9_-]*')
+_RE_WS = re.compile(r'\s*')
+_RE_FLOAT = re.compile(r'[0-9.]*')
+_RE_HEX = re.compile(r'[0-9a-fA-F]*')
+
+# Fused declaration scaffolding: one match for `name :` (with surrounding
+# whitespace) and one for the trailing `;`, replacing six helper calls.
+_RE_DECL_HEAD = re.compile(r'([A-Za-z0-9_-]+)\s*:\s*')
+_RE_DECL_TAIL = re.compile(r'\s*;')
+
+# ASCII -> nibble value lookup table, so color parsing skips the generic
+# base-conversion machinery behind int(s, 16).
+_HEX_NIBBLE = bytearray(256)
+for _i, _c in enumerate('0123456789abcdef'):
+    _HEX_NIBBLE[ord(_c)] = _i
+    _HEX_NIBBLE[ord(_c.upper())] = _i
+del _i, _c
 
 class Stylesheet:
     """
     Class type for top-level style sheet.
     :param rules: List of `Rule`.
     """
+    __slots__ = ('rules', '_sorted_rules', '_index')
+
     def __init__(self, rules: list['Rule']):
         self.rules = rules
+        self._sorted_rules = None
+        self._index = None
 
     def __repr__(self) -> str:
         return f"Stylesheet({self.rules})"
 
+    def sorted_rules(self) -> list[tuple['Specificity', 'Rule', 'SimpleSelector']]:
+        """Returns `(specificity, rule, selector)` triples over every
+        selector of every rule, sorted ascending by specificity.
+
+        Computed lazily on first use and cached, so style application pays
+        for one sort per stylesheet instead of one per element.
+        """
+        if self._sorted_rules is None:
+            self._sorted_rules = sorted(
+                ((sel._spec, rule, sel.simple_selector)
+                 for rule in self.rules for sel in rule.selectors),
+                key=itemgetter(0))
+        return self._sorted_rules
+
+    def rule_index(self):
+        """Returns `(by_id, by_class, by_tag, universal)` buckets over the
+        sorted rule triples, built lazily once per stylesheet.
+
+        Each selector lands in exactly one bucket, keyed by its most
+        specific part (id > class > tag > universal), so matching an
+        element only has to consider the buckets its tag/id/classes could
+        possibly hit instead of scanning every rule. Entries are
+        `(order, specificity, rule, selector)` with `order` the position
+        in sorted_rules(), letting callers restore cascade order after
+        gathering candidates from several buckets.
+        """
+        if self._index is None:
+            by_id: dict = {}
+            by_class: dict = {}
+            by_tag: dict = {}
+            universal = []
+            for order, (spec, rule, sel) in enumerate(self.sorted_rules()):
+                entry = (order, spec, rule, sel)
+                if sel.id:
+                    by_id.setdefault(sel.id, []).append(entry)
+                elif sel.class_name:
+                    by_class.setdefault(sel.class_name[0], []).append(entry)
+                elif sel.tag_name:
+                    by_tag.setdefault(sel.tag_name, []).append(entry)
+                else:
+                    universal.append(entry)
+            self._index = (by_id, by_class, by_tag, universal)
+        return self._index
+
 class Rule:
     """
     Class type for a CSS Rule.
     :param selectors: List of `Selector`.
     :param declarations: List of `Declaration`.
     """
+    __slots__ = ('selectors', 'declarations')
+
     def __init__(self, selectors: list['Selector'], declarations: list['Declaration']):
         self.selectors = selectors
         self.declarations = declarations
@@ -31,18 +106,23 @@ class Selector:
     Class type for a CSS Selector.
     :param simple_selector: `SimpleSelector` type.
     """
+    __slots__ = ('simple_selector', '_spec')
+
     def __init__(self, simple_selector: 'SimpleSelector'):
         self.simple_selector = simple_selector
+        # Specificity never changes once the selector is built, so compute
+        # it once here instead of on every sort-key call.
+        a = 1 if simple_selector.id else 0
+        b = len(simple_selector.class_name)
+        c = 1 if simple_selector.tag_name else 0
+        self._spec = (a, b, c)
 
     def __repr__(self) -> str:
         return f"Selector({self.simple_selector.id, self.simple_selector.tag_name, self.simple_selector.class_name})"
 
     def specificity(self) -> Specificity:
         """Returns a tuple of the selector's specificity."""
-        a = 1 if self.simple_selector.id else 0
-        b = len(self.simple_selector.class_name)
-        c = 1 if self.simple_selector.tag_name else 0
-        return (a, b, c)
+        return self._spec
     
 class SimpleSelector:
     """
@@ -51,10 +131,19 @@ class SimpleSelector:
     :param id: Element's id string.
     :param class_name: Element's class name string.
     """
+    __slots__ = ('tag_name', 'id', 'class_name', 'class_set')
+
     def __init__(self, tag_name: str | None, id: str | None, class_name: list[str]):
         self.tag_name = tag_name
         self.id = id
         self.class_name = class_name
+        # Frozen once at parse time so matching can run one C-level
+        # subset test instead of per-class membership checks.
+        self.class_set = frozenset(class_name)
+
+# Shared instance for the universal selector (`*` or empty). Treated as
+# immutable once parsing is done.
+_UNIVERSAL = SimpleSelector(None, None, [])
 
 class Declaration:
     """
@@ -62,6 +151,8 @@ class Declaration:
     :param name: The `name` of the `name="value"` pair.
     :param value: The `value` of the `name="value"` pair.
     """
+    __slots__ = ('name', 'value')
+
     def __init__(self, name: str, value: 'Value'):
         self.name = name
         self.value = value
@@ -71,32 +162,48 @@ class Declaration:
     
 class Unit:
     """Base class for CSS units."""
-    pass
+    __slots__ = ()
 
 class Px(Unit):
     """The Pixel unit class."""
+    __slots__ = ()
+
     def __init__(self):
         super().__init__()
     
     def __repr__(self) -> str:
         return "Px"
 
+# Px is stateless, so every length can share this one instance instead of
+# allocating a fresh unit object per value.
+PX = Px()
+
 class Color:
     """The Color class."""
+    __slots__ = ('r', 'g', 'b', 'a', 'rgba')
+
     def __init__(self, r: int = 0, g: int = 0, b: int = 0, a: int = 0):
         self.r = r
         self.g = g
         self.b = b
         self.a = a
+        # Channels packed once at construction; painting broadcasts this
+        # tuple straight into the pixel array instead of doing four
+        # attribute loads and a tuple build per command.
+        self.rgba = (r, g, b, a)
 
     def __repr__(self) -> str:
         return "Color(r={self.r}, g={self.g}, b={self.g}, a={self.a})"
 
+# Shared default color (fully transparent black).
+TRANSPARENT = Color()
+
 class Value:
     """Class that holds all different value types."""
+    __slots__ = ('keyword', 'length', 'color')
 
     # Honestly should refactor this to be more explicit with the types and shit.
-    def __init__(self, *, keyword: str | None = "", length: tuple[float, Unit] = (0.0, Px()), color: Color = Color()):
+    def __init__(self, *, keyword: str | None = "", length: tuple[float, Unit] = (0.0, PX), color: Color = TRANSPARENT):
         self.keyword = keyword
         self.length = length
         self.color = color
@@ -122,6 +229,7 @@ class Parser:
     def __init__(self, source: str, pos: int = 0):
         self.pos = pos
         self.source = source
+        self._n = len(source)
 
     def _parse_rules(self) -> list[Rule]:
         """Parses a list of `Rule`."""
@@ -153,7 +261,7 @@ class Parser:
                 break
             else:
                 raise ValueError(f"Unexpected character {next_char} in selector list")
-        selectors.sort(key=lambda s: s.specificity(), reverse=True)
+        selectors.sort(key=attrgetter('_spec'), reverse=True)
         return selectors
 
     def _parse_simple_selector(self) -> SimpleSelector:
@@ -175,6 +283,8 @@ class Parser:
                 tag_name = self._parse_identifier()
             else:
                 break
+        if tag_name is None and id is None and not class_name:
+            return _UNIVERSAL
         return SimpleSelector(tag_name, id, class_name)
 
     def _parse_declarations(self) -> list[Declaration]:
@@ -191,14 +301,16 @@ class Parser:
 
     def _parse_declaration(self) -> Declaration:
         """Parses a `Declaration`."""
-        name = self._parse_identifier()
-        self._consume_whitespace()
-        self._expect_char(':')
-        self._consume_whitespace()
+        head = _RE_DECL_HEAD.match(self.source, self.pos)
+        if head is None:
+            raise ValueError(f"Malformed declaration at byte {self.pos}")
+        self.pos = head.end()
         value = self._parse_value()
-        self._consume_whitespace()
-        self._expect_char(';')
-        return Declaration(name, value)
+        tail = _RE_DECL_TAIL.match(self.source, self.pos)
+        if tail is None:
+            raise ValueError(f"Expected ';' at byte {self.pos} but not found")
+        self.pos = tail.end()
+        return Declaration(head.group(1), value)
 
     def _parse_value(self) -> Value:
         """Parses some values."""
@@ -219,45 +331,59 @@ class Parser:
 
     def _parse_float(self):
         """Parses float numbers."""
-        return float(self._consume_while(lambda c: c.isdigit() or c == '.'))
+        m = _RE_FLOAT.match(self.source, self.pos)
+        self.pos = m.end()
+        return float(m.group())
     
     def _parse_unit(self) -> Unit:
         """Parses CSS length units. Currently only supports `px`."""
         if self._parse_identifier().lower() == "px":
-            return Px()
+            return PX
         else:
             raise SyntaxError("Unrecognized unit")
 
     def _parse_color(self) -> Value:
-        """Parses a color from a hex string."""
+        """Parses a color from a hex string (`#rrggbb` or `#rgb` shorthand)."""
         self._expect_char('#')
-        return Value(color=Color(
-            r=self._parse_hex_pair(),
-            g=self._parse_hex_pair(),
-            b=self._parse_hex_pair(),
-            a=255
-        ))
-
-    def _parse_hex_pair(self) -> int:
-        """Parses color values 2 Hexadecimal values at a time."""
-        s = self.source[self.pos:self.pos + 2]
-        self.pos += 2
-        return int(s, 16)
+        digits = _RE_HEX.match(self.source, self.pos).group()
+        nib = _HEX_NIBBLE
+        if len(digits) >= 6:
+            self.pos += 6
+            r = (nib[ord(digits[0])] << 4) | nib[ord(digits[1])]
+            g = (nib[ord(digits[2])] << 4) | nib[ord(digits[3])]
+            b = (nib[ord(digits[4])] << 4) | nib[ord(digits[5])]
+        elif len(digits) >= 3:
+            self.pos += 3
+            # Shorthand #rgb doubles each nibble: 0xN -> 0xNN.
+            r = nib[ord(digits[0])] * 17
+            g = nib[ord(digits[1])] * 17
+            b = nib[ord(digits[2])] * 17
+        else:
+            raise ValueError(f"Expected hex color at byte {self.pos} but not found")
+        return Value(color=Color(r=r, g=g, b=b, a=255))
 
     def _parse_identifier(self) -> str:
         """Parses identifiers."""
-        return self._consume_while(_valid_identifier_char)
+        m = _RE_IDENT.match(self.source, self.pos)
+        self.pos = m.end()
+        return m.group()
 
     def _consume_whitespace(self) -> None:
         """Moves cursor forward while current character is whitespace."""
-        self._consume_while(str.isspace)
+        self.pos = _RE_WS.match(self.source, self.pos).end()
 
     def _consume_while(self, test) -> str:
         """Moves cursor forward while `test` function returns true."""
-        result = []
-        while not self._eof() and test(self._next_char()):
-            result.append(self._consume_char())
-        return ''.join(result)
+        # The source is immutable, so track the start index and take one
+        # slice at the end instead of joining per-character strings.
+        source = self.source
+        n = self._n
+        start = self.pos
+        pos = start
+        while pos < n and test(source[pos]):
+            pos += 1
+        self.pos = pos
+        return source[start:pos]
 
     def _consume_char(self) -> str:
         """Moves cursor forward one character."""
@@ -272,23 +398,17 @@ class Parser:
 
     def _next_char(self) -> str:
         """Reads the next character without consuming it."""
-        # The comment for this function on github is most likely wrong.
-
-        # Probably needs better error handling, like with rust's .unwrap()
-        c = self.source[self.pos + 1]
-
-        if c:
-            return c
-        else:
-            raise ValueError("No character left to read.")
+        if self.pos < self._n:
+            return self.source[self.pos]
+        raise ValueError("No character left to read.")
 
     def _eof(self) -> bool:
         """Returns true if all input is consumed."""
-        return self.pos >= len(self.source)
+        return self.pos >= self._n
 
 def _valid_identifier_char(c) -> bool:
     # TODO: Include U+00A0 and higher.
-    return re.match(r'[a-zA-Z0-9_-]', c) is not None
+    return c in _IDENT_CHARS
 
 # Usage example
 if __name__ == "__main__":
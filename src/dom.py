@@ -5,7 +5,7 @@ AttrMap = dict[str, str]
 # NodeType class equivalent to Rust's enum
 class NodeType:
     """Base class for HTML Node types."""
-    pass
+    __slots__ = ()
     
 
 class DocType(NodeType):
@@ -13,6 +13,8 @@ class DocType(NodeType):
     Node type class for the `<!DOCTYPE>` tag.
     :param doc_type: Doc-type string value, usually `html`.
     """
+    __slots__ = ('doc_type',)
+
     def __init__(self, doc_type: str):
         self.doc_type = doc_type
 
@@ -25,6 +27,8 @@ class Text(NodeType):
     Node type class for text no enclosed in HTML element tags.
     :param text: Text string.
     """
+    __slots__ = ('text',)
+
     def __init__(self, text: str):
         self.text = text
 
@@ -38,6 +42,8 @@ class Element(NodeType):
     :param tag_name: Tag name string. (i.e. 'p' for `<p>`).
     :param attrs: Attribute dictionary
     """
+    __slots__ = ('tag_name', 'attrs')
+
     def __init__(self, tag_name: str, attrs: AttrMap):
         self.tag_name = tag_name
         self.attrs = attrs
@@ -60,6 +66,8 @@ class Comment(NodeType):
     Node type class for HTML comment tags `<!-- -->`.
     :param comment: Comment string.
     """
+    __slots__ = ('comment',)
+
     def __init__(self, comment: str):
         self.comment = comment
 
@@ -74,8 +82,12 @@ class Node:
     :param node_type: NodeType subclass instance
     :param children: List of node's child nodes.
     """
-    def __init__(self, node_type: NodeType, children: list['Node'] = []):
-        self.children = children
+    __slots__ = ('children', 'node_type')
+
+    def __init__(self, node_type: NodeType, children: list['Node'] | None = None):
+        # A mutable default list would be shared by every Node constructed
+        # without children, so use a None sentinel instead.
+        self.children = [] if children is None else children
         self.node_type = node_type
 
     def __repr__(self):
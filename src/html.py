@@ -2,6 +2,26 @@ import dom
 import re
 
 
+# Precompiled span patterns for the common consume loops. A single C-level
+# regex scan replaces one Python-level predicate call per character.
+_RE_NAME = re.compile(r'[A-Za-z0-9-]*')
+_RE_WS = re.compile(r'\s*')
+_RE_UNTIL_LT = re.compile(r'[^<]*')
+_RE_UNTIL_GT = re.compile(r'[^>]*')
+_RE_UNTIL_DQUOTE = re.compile(r'[^"]*')
+_RE_UNTIL_SQUOTE = re.compile(r"[^']*")
+
+# Shared attribute map for the common attribute-free tag. Treated as
+# immutable by convention — nothing mutates Element.attrs after parsing.
+_EMPTY_ATTRS: dom.AttrMap = {}
+
+# HTML5 void elements: tags that never take a closing tag.
+_VOID_ELEMENTS = frozenset((
+    'area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link',
+    'meta', 'param', 'source', 'track', 'wbr',
+))
+
+
 def parse(source: str) -> dom.Node:
     "Parses HTML source string into DOM tree."
     nodes = Parser(source, 0)._parse_nodes()
@@ -21,28 +41,59 @@ class Parser:
     def __init__(self, source: str, pos: int = 0):
         self.source = source
         self.pos = pos
+        self._n = len(source)
+        # Lowercased once up front so case-insensitive probes are O(needle)
+        # instead of lowercasing a window per call.
+        self._lower = source.lower()
 
     def _parse_nodes(self) -> list[dom.Node]:
-        """Parse a sequence of sibling nodes."""
-        nodes = []
+        """Parse a sequence of sibling nodes.
+
+        Element nesting is handled with an explicit stack rather than
+        recursion, so deeply nested documents cost neither a Python frame
+        per level nor a RecursionError.
+        """
+        source = self.source
+        n = self._n
+        # children_stack[0] collects the top-level siblings; one list is
+        # pushed per currently-open element, mirrored by open_tags.
+        children_stack: list[list[dom.Node]] = [[]]
+        open_tags: list[tuple[str, dom.AttrMap]] = []
         while True:
-            self._consume_whitespace()
-            if self._eof() or self._starts_with("</"):
+            self.pos = _RE_WS.match(source, self.pos).end()
+            if self.pos >= n:
                 break
-            node = self._parse_node()
-            nodes.append(node)
-        return nodes
-
-    def _parse_node(self) -> dom.Node:
-        """Parse a single node."""
-        if self._starts_with("<!DOCTYPE", case_insensitive=True):
-            return self._parse_doctype()
-        elif self._starts_with("<!--"):
-            return self._parse_comment()
-        elif self._starts_with("<"):
-            return self._parse_element()
-        else:
-            return self._parse_text()
+            # Fast path: anything that doesn't open a tag is a text run,
+            # consumed in one span up to the next '<'.
+            if source[self.pos] != '<':
+                children_stack[-1].append(self._parse_text())
+                continue
+            if source.startswith('</', self.pos):
+                if not open_tags:
+                    break
+                tag_name, attrs = open_tags.pop()
+                closing = f"</{tag_name}>"
+                if not source.startswith(closing, self.pos):
+                    raise ValueError(f"Expected {closing!r} at byte {self.pos} but it was not found")
+                self.pos += len(closing)
+                children = children_stack.pop()
+                children_stack[-1].append(dom.elem(tag_name, attrs, children))
+                continue
+            if source.startswith('<!', self.pos):
+                if source.startswith('<!--', self.pos):
+                    children_stack[-1].append(self._parse_comment())
+                else:
+                    children_stack[-1].append(self._parse_doctype())
+                continue
+            tag_name, attrs, has_children = self._parse_open_tag()
+            if has_children:
+                open_tags.append((tag_name, attrs))
+                children_stack.append([])
+            else:
+                children_stack[-1].append(dom.elem(tag_name, attrs, []))
+        if open_tags:
+            raise ValueError(f"Expected '</{open_tags[-1][0]}>' at byte {self.pos} but it was not found")
+        return children_stack[0]
 
     def _parse_doctype(self) -> dom.Node:
         """Parse a HTML `DOCTYPE` tag."""
@@ -50,7 +101,9 @@ class Parser:
         self._expect("<!DOCTYPE", case_insensitive=True)
         
         # Declaration content
-        doctype = self._consume_while(lambda c: c != ">")
+        m = _RE_UNTIL_GT.match(self.source, self.pos)
+        self.pos = m.end()
+        doctype = m.group()
 
         # Expect closing
         self._expect(">")
@@ -62,92 +115,113 @@ class Parser:
         # Opening tag
         self._expect("<!--")
 
-        # Contents
-        comment = self._consume_while(lambda c: not self._starts_with("-->"))
+        # Contents: find the closing marker in one C-level search. The old
+        # predicate peeked at self.pos, which _consume_while no longer
+        # updates per character.
+        end = self.source.find("-->", self.pos)
+        if end == -1:
+            raise ValueError(f"Expected '-->' at byte {self.pos} but it was not found")
+        comment = self.source[self.pos:end]
 
         # Closing comment tag
-        self._expect("-->")
+        self.pos = end + 3
 
         return dom.comment(comment)
 
-    def _parse_element(self) -> dom.Node:
-        """Parse a HTML element (supports self-closing tags)."""
-        # Opening tag
-        self._expect("<")
+    def _parse_open_tag(self) -> tuple[str, dom.AttrMap, bool]:
+        """Parse an opening tag; returns `(tag_name, attrs, has_children)`.
+
+        `has_children` is False for self-closing (`<br/>`) and HTML5 void
+        elements, which never take a closing tag.
+        """
+        # The _expect/_starts_with helpers are inlined here as direct
+        # position checks; this method runs once per element.
+        source = self.source
+        if not source.startswith("<", self.pos):
+            raise ValueError(f"Expected '<' at byte {self.pos} but it was not found")
+        self.pos += 1
         tag_name = self._parse_name()
         attrs = self._parse_attributes()
 
         # Check if this is a self-closing tag
-        if self._starts_with("/>"):
-            self._expect("/>")
-            element = dom.elem(tag_name, attrs, [])
-            return element
-        
-        self._expect(">")
+        if source.startswith("/>", self.pos):
+            self.pos += 2
+            return (tag_name, attrs, False)
+
+        if not source.startswith(">", self.pos):
+            raise ValueError(f"Expected '>' at byte {self.pos} but it was not found")
+        self.pos += 1
 
         # Check if this is a self-closing tag without the '/' according to HTML5 standard
-        if tag_name.lower() in ['area', 'base', 'br', 'col', 'embed', 'hr', 'img', 'input', 'link', 'meta', 'param', 'source', 'track', 'wbr']:
-            element = dom.elem(tag_name, attrs, [])
-            return element
+        if tag_name.lower() in _VOID_ELEMENTS:
+            return (tag_name, attrs, False)
 
-        # Contents
-        children = self._parse_nodes()
+        return (tag_name, attrs, True)
 
-        # Closing tag.
-        self._expect("</")
-        self._expect(tag_name)
-        self._expect(">")
 
-        element = dom.elem(tag_name, attrs, children)
-        return element
-    
     def _parse_name(self) -> str:
         """Parse the name of the tag or attribute."""
-        name = self._consume_while(lambda c: re.match(r'[a-zA-Z0-9\-]', c))
-        return name
+        m = _RE_NAME.match(self.source, self.pos)
+        self.pos = m.end()
+        return m.group()
 
     def _parse_attributes(self) -> dom.AttrMap:
         """Parse a list of `name=\"value\"` pairs, seperated by whitespace."""
-        attributes = {}
+        source = self.source
+        pairs = []
         while True:
-            self._consume_whitespace()
-            if self._starts_with("/>") or self._starts_with(">"):
+            self.pos = _RE_WS.match(source, self.pos).end()
+            if source.startswith(">", self.pos) or source.startswith("/>", self.pos):
                 break
-            name, value = self._parse_attr()
-            attributes[name] = value
-        return attributes
+            pairs.append(self._parse_attr())
+        if not pairs:
+            return _EMPTY_ATTRS
+        return dict(pairs)
 
     def _parse_attr(self) -> tuple[str, str]:
         """Parse a single `name=\"value\"` pair."""
         name = self._parse_name()
-        self._expect("=")
+        if not self.source.startswith("=", self.pos):
+            raise ValueError(f"Expected '=' at byte {self.pos} but it was not found")
+        self.pos += 1
         value = self._parse_attr_value()
         return (name, value)
 
     def _parse_attr_value(self) -> str:
         """Parse a quoted value (`\'\'` or `\"\"`)."""
-        open_quote = self._consume_char()
+        source = self.source
+        open_quote = source[self.pos]
         assert open_quote in ('"', "'")
-        value = self._consume_while(lambda c: c != open_quote)
-        close_quote = self._consume_char()
-        assert open_quote == close_quote
+        self.pos += 1
+        pattern = _RE_UNTIL_DQUOTE if open_quote == '"' else _RE_UNTIL_SQUOTE
+        m = pattern.match(source, self.pos)
+        value = m.group()
+        assert source.startswith(open_quote, m.end())
+        self.pos = m.end() + 1
         return value
 
     def _parse_text(self) -> dom.Node:
         """Parse HTML text."""
-        text = self._consume_while(lambda c: c != '<')
-        return dom.text(text)
+        m = _RE_UNTIL_LT.match(self.source, self.pos)
+        self.pos = m.end()
+        return dom.text(m.group())
 
     def _consume_whitespace(self):
         """Skips over whitespace."""
-        self._consume_while(str.isspace)
+        self.pos = _RE_WS.match(self.source, self.pos).end()
 
     def _consume_while(self, test) -> str:
         """Advances the cursor until `test` returns `False`."""
-        result = []
-        while not self._eof() and test(self._next_char()):
-            result.append(self._consume_char())
-        return ''.join(result)
+        # The source is immutable, so track the start index and take one
+        # slice at the end instead of joining per-character strings.
+        source = self.source
+        n = self._n
+        start = self.pos
+        pos = start
+        while pos < n and test(source[pos]):
+            pos += 1
+        self.pos = pos
+        return source[start:pos]
 
     def _consume_char(self) -> str:
         """Returns the current character and advances the cursor to next character."""
@@ -167,9 +241,9 @@ class Parser:
         :param case_insensitive: Toggles case-insensitive check, default is `False`.
         """
         if case_insensitive:
-            return self.source[self.pos:].lower().startswith(s.lower())
+            return self._lower.startswith(s.lower(), self.pos)
         else:
-            return self.source[self.pos:].startswith(s)
+            return self.source.startswith(s, self.pos)
 
     # If the exact string `s` is found at the current position, consume it.
     # Otherwise, raise an error.
@@ -186,4 +260,4 @@ class Parser:
     # Return true if all input is consumed.
     def _eof(self) -> bool:
         """Returns `True` if reached End of File."""
-        return self.pos >= len(self.source)
+        return self.pos >= self._n
@@ -1,10 +1,16 @@
 import style
 import css
-from functools import reduce
-import collections.abc as c
+
+
+# Shared values used by the width pass; hoisted so the per-box passes
+# don't allocate a fresh Value per lookup or per auto-check.
+_ZERO = css.Value(length=(0.0, css.PX))
+_AUTO = css.Value(keyword="auto")
 
 
 class Rect:
+    __slots__ = ('x', 'y', 'width', 'height')
+
     def __init__(self, x: float = 0.0, y: float = 0.0, width: float = 0.0, height: float = 0.0):
         self.x = x
         self.y = y
@@ -23,6 +29,8 @@ class Rect:
     
 
 class Dimensions:
+    __slots__ = ('content', 'padding', 'border', 'margin')
+
     def __init__(self, content: Rect, padding: 'EdgeSizes', border: 'EdgeSizes', margin: 'EdgeSizes'):
         self.content = content
         self.padding = padding
@@ -47,6 +55,8 @@ class Dimensions:
 
 
 class EdgeSizes:
+    __slots__ = ('left', 'right', 'top', 'bottom')
+
     def __init__(self, left: float = 0.0, right: float = 0.0, top: float = 0.0, bottom: float = 0.0):
         self.left = left
         self.right = right
@@ -57,11 +67,24 @@ class EdgeSizes:
         return f"EdgeSize({self.left}, {self.right}, {self.top}, {self.bottom})"
 
 
+# Integer kind tags for the box types; comparing one int beats an
+# isinstance MRO walk in the hot layout/paint paths.
+BLOCK = 0
+INLINE = 1
+ANONYMOUS = 2
+
+
 class BoxType:
-    pass
+    __slots__ = ()
+
+    KIND = -1
 
 
 class BlockNode(BoxType):
+    __slots__ = ('styled_node',)
+
+    KIND = BLOCK
+
     def __init__(self, styled_node: style.StyledNode):
         self.styled_node = styled_node
 
@@ -70,6 +93,10 @@ class BlockNode(BoxType):
 
 
 class InlineNode(BoxType):
+    __slots__ = ('styled_node',)
+
+    KIND = INLINE
+
     def __init__(self, styled_node: style.StyledNode):
         self.styled_node = styled_node
 
@@ -78,15 +105,29 @@ class InlineNode(BoxType):
 
 
 class AnonymousBlock(BoxType):
+    __slots__ = ()
+
+    KIND = ANONYMOUS
+
     def __repr__(self) -> str:
         return f"AnonymousBlock()"
 
 
 class LayoutBox:
+    __slots__ = ('dimensions', 'box_type', 'children', 'kind', 'border_rect',
+                 'background_color', 'border_color')
+
     def __init__(self, dimensions: Dimensions, box_type: BoxType, children: list['LayoutBox']):
         self.dimensions = dimensions
         self.box_type = box_type
         self.children = children
+        self.kind = box_type.KIND
+        # Cached by flatten() once layout is done, so painting doesn't
+        # re-derive the border box through the expanded_by chain or
+        # re-resolve the colors per use.
+        self.border_rect: Rect | None = None
+        self.background_color: css.Color | None = None
+        self.border_color: css.Color | None = None
 
     def __repr__(self) -> str:
         return f"Layout(dimensions={self.dimensions}, box_type={self.box_type}, children={self.children})"
@@ -96,107 +137,130 @@ class LayoutBox:
         return LayoutBox(Dimensions._default(), box_type, [])
     
     def _get_style_node(self) -> style.StyledNode:
-        if isinstance(self.box_type, BlockNode) or isinstance(self.box_type, InlineNode):
+        if self.kind != ANONYMOUS:
             return self.box_type.styled_node
         else:
             raise ValueError("Anonymous block box has no style node!")
 
     def _layout(self, containing_block: Dimensions):
-        if isinstance(self.box_type, BlockNode):
-            self._layout_block(containing_block)
-        elif isinstance(self.box_type, InlineNode) or isinstance(self.box_type, AnonymousBlock):
-            # TODO
-            pass
-
-    def _layout_block(self, containing_block: Dimensions):
-        self._calculate_block_width(containing_block)
-        self._calculate_block_position(containing_block)
-        self._layout_block_children()
-        self._calculate_block_height()
+        """Lays out this box and all of its descendants.
+
+        Runs as an explicit two-phase work stack instead of recursing:
+        phase 0 computes a block's width and position before its children
+        are visited, phase 1 accumulates the children's heights afterwards.
+        Deep trees therefore cost no Python frame per level.
+        """
+        stack = [(self, containing_block, 0)]
+        while stack:
+            box, cb, phase = stack.pop()
+            if box.kind != BLOCK:
+                # TODO: inline and anonymous block layout
+                continue
+            if phase == 0:
+                box._calculate_block_width(cb)
+                box._calculate_block_position(cb)
+                # Revisit for the height pass once the children are done;
+                # children are pushed afterwards so they pop first.
+                stack.append((box, cb, 1))
+                for child in reversed(box.children):
+                    stack.append((child, box.dimensions, 0))
+            else:
+                for child in box.children:
+                    box.dimensions.content.height += child.dimensions.margin_box().height
+                box._calculate_block_height()
 
     def _calculate_block_width(self, containing_block: Dimensions):
         style = self._get_style_node()
 
-        auto = css.Value(keyword="auto")
-        width = style.value("width") or auto
+        width = style.value("width") or _AUTO
+
+        margin_left = style.lookup("margin-left", "margin", _ZERO)
+        margin_right = style.lookup("margin-right", "margin", _ZERO)
 
-        zero = css.Value(length=(0.0, css.Px()))
+        border_left = style.lookup("border-left-width", "border-width", _ZERO)
+        border_right = style.lookup("border-right-width", "border-width", _ZERO)
 
-        margin_left = style.lookup("margin-left", "margin", zero)
-        margin_right = style.lookup("margin-right", "margin", zero)
+        padding_left = style.lookup("padding-left", "padding", _ZERO)
+        padding_right = style.lookup("padding-right", "padding", _ZERO)
 
-        border_left = style.lookup("border-left-width", "border-width", zero)
-        border_right = style.lookup("border-right-width", "border-width", zero)
+        # Resolve every value to a float once; the adjustment logic below
+        # and the final writes work on these locals instead of re-calling
+        # to_px or wrapping intermediates in fresh Value objects.
+        w = width.to_px()
+        ml = margin_left.to_px()
+        mr = margin_right.to_px()
+        bl = border_left.to_px()
+        br = border_right.to_px()
+        pl = padding_left.to_px()
+        pr = padding_right.to_px()
 
-        padding_left = style.lookup("padding-left", "padding", zero)
-        padding_right = style.lookup("padding-right", "padding", zero)
+        total = ml + mr + bl + br + pl + pr + w
 
-        total = _sum([
-            margin_left.to_px(),
-            margin_right.to_px(),
-            border_left.to_px(),
-            border_right.to_px(),
-            padding_left.to_px(),
-            padding_right.to_px(),
-            width.to_px()
-        ])
+        # Identity checks are enough here: _AUTO is the shared singleton
+        # handed out by the defaulted lookups above.
+        w_auto = width is _AUTO
+        ml_auto = margin_left is _AUTO
+        mr_auto = margin_right is _AUTO
 
-        if width != auto and total > containing_block.content.width:
-            if margin_left == auto:
-                margin_left = css.Value(length=(0.0, css.Px()))
-            if margin_right == auto:
-                margin_right = css.Value(length=(0.0, css.Px()))
+        if not w_auto and total > containing_block.content.width:
+            if ml_auto:
+                ml = 0.0
+                ml_auto = False
+            if mr_auto:
+                mr = 0.0
+                mr_auto = False
 
         underflow = containing_block.content.width - total
 
-        match (width == auto, margin_left == auto, margin_right == auto):
-            case (False, False, False):
-                margin_right = css.Value(length=(margin_right.to_px() + underflow, css.Px()))
-            case (False, False, True):
-                margin_right = css.Value(length=(underflow, css.Px()))
-            case (False, True, False):
-                margin_left = css.Value(length=(underflow, css.Px()))
-            case (False, True, True):
-                margin_left = css.Value(length=(underflow / 2.0, css.Px()))
-                margin_right = css.Value(length=(underflow / 2.0, css.Px()))
-            case (True, _, _):
-                if margin_left == auto:
-                    margin_left = css.Value(length=(0.0, css.Px()))
-                if margin_right == auto:
-                    margin_right = css.Value(length=(0.0, css.Px()))
-
-                if underflow >= 0.0:
-                    width = css.Value(length=(underflow, css.Px()))
-                else:
-                    width = css.Value(length=(0.0, css.Px()))
-                    margin_right = css.Value(length=(margin_right.to_px() + underflow, css.Px()))
+        # Pack the three auto flags into one integer so the constraint
+        # dispatch is a flat if-ladder of int compares instead of a match
+        # statement building and comparing a tuple per call.
+        key = (w_auto << 2) | (ml_auto << 1) | mr_auto
+        if key >= 0b100:  # width: auto overrides both margins
+            if ml_auto:
+                ml = 0.0
+            if mr_auto:
+                mr = 0.0
+            if underflow >= 0.0:
+                w = underflow
+            else:
+                w = 0.0
+                mr += underflow
+        elif key == 0b000:
+            mr += underflow
+        elif key == 0b001:
+            mr = underflow
+        elif key == 0b010:
+            ml = underflow
+        else:  # 0b011: both margins auto, split the slack
+            ml = underflow / 2.0
+            mr = underflow / 2.0
 
         d = self.dimensions
-        d.content.width = width.to_px()
+        d.content.width = w
 
-        d.padding.left = padding_left.to_px()
-        d.padding.right = padding_right.to_px()
+        d.padding.left = pl
+        d.padding.right = pr
 
-        d.border.left = border_left.to_px()
-        d.border.right = border_right.to_px()
+        d.border.left = bl
+        d.border.right = br
 
-        d.margin.left = margin_left.to_px()
-        d.margin.right = margin_right.to_px()
+        d.margin.left = ml
+        d.margin.right = mr
 
     def _calculate_block_position(self, containing_block: Dimensions):
         styled_node = self._get_style_node()
         d = self.dimensions
 
-        zero = css.Value(length=(0.0, css.Px()))
+        lookup = styled_node.lookup
+        d.margin.top = lookup("margin-top", "margin", _ZERO).to_px()
+        d.margin.bottom = lookup("margin-bottom", "margin", _ZERO).to_px()
 
-        d.margin.top = styled_node.lookup("margin-top", "margin", zero).to_px()
-        d.margin.bottom = styled_node.lookup("margin-bottom", "margin", zero).to_px()
+        d.border.top = lookup("border-top", "border", _ZERO).to_px()
+        d.border.bottom = lookup("border-bottom", "border", _ZERO).to_px()
 
-        d.border.top = styled_node.lookup("border-top", "border", zero).to_px()
-        d.border.bottom = styled_node.lookup("border-bottom", "border", zero).to_px()
-
-        d.padding.top = styled_node.lookup("padding-top", "padding", zero).to_px()
-        d.padding.bottom = styled_node.lookup("padding-bottom", "padding", zero).to_px()
+        d.padding.top = lookup("padding-top", "padding", _ZERO).to_px()
+        d.padding.bottom = lookup("padding-bottom", "padding", _ZERO).to_px()
 
         d.content.x = containing_block.content.x + d.margin.left + d.border.left + d.padding.left
         d.content.y = containing_block.content.y + d.margin.top + d.border.top + d.padding.top
@@ -207,16 +271,11 @@ class LayoutBox:
         if style_value is not None and isinstance(style_value.length[1], css.Px):
             self.dimensions.content.height = style_value.to_px()
 
-    def _layout_block_children(self):
-        for child in self.children:
-            child._layout(self.dimensions)
-            self.dimensions.content.height += child.dimensions.margin_box().height
-
     def _get_inline_container(self) -> 'LayoutBox':
-        if isinstance(self.box_type, InlineNode) or isinstance(self.box_type, AnonymousBlock):
+        if self.kind == INLINE or self.kind == ANONYMOUS:
             return self
-        elif isinstance(self.box_type, BlockNode):
-            if self.children and isinstance(self.children[-1].box_type, AnonymousBlock):
+        elif self.kind == BLOCK:
+            if self.children and self.children[-1].kind == ANONYMOUS:
                 return self.children[-1]
             else:
                 new_child = LayoutBox._new(AnonymousBlock())
@@ -226,6 +285,31 @@ class LayoutBox:
             raise ValueError("Unknown BoxType Instance: {self.box_type}")
             
 
+def flatten(root: LayoutBox) -> list[LayoutBox]:
+    """Flattens a layout tree into paint order (parents before children)
+    using an explicit stack, so consumers can iterate a plain list instead
+    of recursing through the pointer tree."""
+    flat = []
+    stack = [root]
+    while stack:
+        box = stack.pop()
+        box.border_rect = box.dimensions.border_box()
+        box.background_color = _resolve_color(box, "background")
+        box.border_color = _resolve_color(box, "border-color")
+        flat.append(box)
+        # Reversed so the first child is popped (and painted) first.
+        stack.extend(reversed(box.children))
+    return flat
+
+def _resolve_color(box: LayoutBox, name: str) -> css.Color | None:
+    """Returns the specified color for CSS property `name`, or None if no
+    color was specified (or the box is anonymous)."""
+    if box.kind != ANONYMOUS:
+        value = box.box_type.styled_node.value(name)
+        if isinstance(value, css.Value):
+            return value.color
+    return None
+
 def layout_tree(node: style.StyledNode, containing_block: Dimensions) -> LayoutBox:
     containing_block.content.y = 0.0
 
@@ -234,25 +318,30 @@ def layout_tree(node: style.StyledNode, containing_block: Dimensions) -> LayoutB
     return root_box
 
 def _build_layout_tree(style_node: style.StyledNode) -> LayoutBox:
-    root: LayoutBox # Just to get mypy to stfu
-    match style_node.display():
-        case style.DisplayBlock:
-            root = LayoutBox._new(BlockNode(style_node))
-        case style.DisplayInline:
-            root = LayoutBox._new(InlineNode(style_node))
-        case style.DisplayNone:
-            raise ValueError(f"Root node has display: None.")
-        
-    for child in style_node.children:
-        match child.display():
-            case style.DisplayBlock:
-                root.children.append(_build_layout_tree(child))
-            case style.DisplayInline:
-                root._get_inline_container().children.append(_build_layout_tree(child))
-            case style.DisplayNone:
-                pass
-
-    return root
-
-def _sum(iterable: c.Iterable):
-    return reduce(lambda a, b: a + b, iterable, 0.0)
\ No newline at end of file
+    """Builds the layout box tree with an explicit worklist, one box per
+    styled node, instead of recursing once per node."""
+    display = style_node.display()
+    if display == style.Display.Block:
+        root = LayoutBox._new(BlockNode(style_node))
+    elif display == style.Display.Inline:
+        root = LayoutBox._new(InlineNode(style_node))
+    else:
+        raise ValueError("Root node has display: none.")
+
+    stack = [(style_node, root)]
+    while stack:
+        sn, parent_box = stack.pop()
+        for child in sn.children:
+            display = child.display()
+            if display == style.Display.Block:
+                child_box = LayoutBox._new(BlockNode(child))
+                parent_box.children.append(child_box)
+            elif display == style.Display.Inline:
+                child_box = LayoutBox._new(InlineNode(child))
+                parent_box._get_inline_container().children.append(child_box)
+            else:
+                # display: none — skip the subtree entirely.
+                continue
+            stack.append((child, child_box))
+
+    return root
\ No newline at end of file
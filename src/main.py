@@ -1,8 +1,7 @@
 import argparse
-from PIL.Image import new
+from PIL import Image
 
 import css
-import dom
 import html
 import layout
 import style
@@ -57,12 +56,9 @@ if __name__ == "__main__":
         canvas = painting.paint(layout_root, viewport.content)
         w, h = canvas.width, canvas.height
 
-        img = new('RGBA', (w, h))
-
-        for y in range(h):
-            for x in range(w):
-                color = canvas.pixels[y * w + x]
-                img.putpixel((x, y), (color.r, color.g, color.b, color.a))
+        # The canvas already holds a (h, w, 4) uint8 RGBA array; hand it to
+        # PIL directly.
+        img = Image.fromarray(canvas.pixels, 'RGBA')
 
         img.save(filename, format='PNG')
         print(f"Saved output as {filename}")
\ No newline at end of file
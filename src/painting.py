@@ -1,13 +1,16 @@
 import layout
 import css
+import numpy as np
 
 
 class DisplayCommand:
     """Base class for all Display commands."""
-    pass
+    __slots__ = ()
 
 class SolidColor(DisplayCommand):
     """A display command to paint a solid color in the associated rectangele."""
+    __slots__ = ('color', 'rect')
+
     def __init__(self, color: css.Color, rect: layout.Rect):
         self.color = color
         self.rect = rect
@@ -15,17 +18,35 @@ class SolidColor(DisplayCommand):
     def __repr__(self) -> str:
         return f"SolidColor({self.color}, {self.rect})"
 
+class SolidColorBatch(DisplayCommand):
+    """A display command to paint several rectangles in the same solid color.
+
+    One batch replaces a run of SolidColor commands sharing a color (the
+    four border edges of a box, typically), so the painter unpacks the
+    color once and dispatches one command instead of four.
+    """
+    __slots__ = ('color', 'rects')
+
+    def __init__(self, color: css.Color, rects: list[layout.Rect]):
+        self.color = color
+        self.rects = rects
+
+    def __repr__(self) -> str:
+        return f"SolidColorBatch({self.color}, {self.rects})"
+
 # A list of all display commands.
 DisplayList = list[DisplayCommand]
 
 class Canvas:
     """
     Class for the area that all the elements will be painted to.
-    :param pixels: The colors of each pixel, from left to right, up to down.
+    :param pixels: `(height, width, 4)` uint8 RGBA array, rows top to bottom.
     :param width: The width of the canvas.
     :param height: The height of the canvas.
     """
-    def __init__(self, pixels: list[css.Color], width: int, height: int):
+    __slots__ = ('pixels', 'width', 'height')
+
+    def __init__(self, pixels: np.ndarray, width: int, height: int):
         self.pixels = pixels
         self.width = width
         self.height = height
@@ -33,109 +54,153 @@ class Canvas:
     @staticmethod
     def _new(width: int, height: int) -> 'Canvas':
         """Creates a new blank canvas."""
-        white = css.Color(255, 255, 255, 255)
-        return Canvas([white] * width * height, width, height)
-    
+        # Packed RGBA bytes: ~4 bytes per pixel instead of a Color object.
+        return Canvas(np.full((height, width, 4), 255, dtype=np.uint8), width, height)
+
     def _paint_item(self, item: DisplayCommand):
         """Sets the color of each pixel in the output image."""
+        color = item.color
+        # Invisible paint: common for border rects with zero width.
+        if color.a == 0:
+            return
+        rgba = color.rgba
         if isinstance(item, SolidColor):
-            x0 = int(self._clamp(item.rect.x, 0.0, float(self.width)))
-            y0 = int(self._clamp(item.rect.y, 0.0, float(self.height)))
-            x1 = int(self._clamp(item.rect.x + item.rect.width, 0.0, self.width))
-            y1 = int(self._clamp(item.rect.x + item.rect.width, 0.0, self.height))
-
-            for y in range(y0, y1):
-                for x in range(x0, x1):
-                    # mbrubeck: TODO: Alpha compositing with existing pixels
-                    # Nani: Nah, I'm lazy.
-                    self.pixels[y * self.width + x] = item.color
-
-    def _clamp(self, value: float, min: float, max: float) -> float:
-        """Helper function to do value range clamping."""
-
-        # There is probably a library that does this (numpy probably), but 
-        # I don't wanna import another library.
-        if value < min:
-            return min
-        elif value > max:
-            return max
-        else:
-            return value
+            self._fill_rect(item.rect, rgba)
+        elif isinstance(item, SolidColorBatch):
+            for rect in item.rects:
+                self._fill_rect(rect, rgba)
+
+    def _fill_rect(self, rect: layout.Rect, rgba: tuple[int, int, int, int]):
+        """Clamps `rect` to the canvas and fills it with `rgba`."""
+        # Clamp inline with the C-level min/max builtins; a _clamp
+        # method cost a bound-method call and frame per edge.
+        w = float(self.width)
+        h = float(self.height)
+        x0 = int(max(0.0, min(w, rect.x)))
+        y0 = int(max(0.0, min(h, rect.y)))
+        x1 = int(max(0.0, min(w, rect.x + rect.width)))
+        y1 = int(max(0.0, min(h, rect.y + rect.height)))
+
+        # Clipped away entirely, or degenerate (zero-width borders
+        # still emit four rects) — nothing to store.
+        if x1 <= x0 or y1 <= y0:
+            return
+
+        self.blit_rect(x0, y0, x1, y1, rgba)
+
+    def blit_rect(self, x0: int, y0: int, x1: int, y1: int, rgba: tuple[int, int, int, int]):
+        """Fills `[y0:y1, x0:x1]` with `rgba`, blending against the existing
+        pixels when the source alpha is partial.
+
+        Opaque fills take the straight broadcast-assignment path; the blend
+        path does `dst = src*a + dst*(1-a)` over the whole region at once in
+        float32, so even the compositing case stays in numpy's vectorized
+        ufuncs instead of a per-pixel Python loop.
+        """
+        a = rgba[3]
+        if a == 255:
+            self.pixels[y0:y1, x0:x1] = rgba
+        elif a != 0:
+            alpha = a / 255.0
+            region = self.pixels[y0:y1, x0:x1].astype(np.float32)
+            src = np.array(rgba, dtype=np.float32)
+            region = region * (1.0 - alpha) + src * alpha
+            self.pixels[y0:y1, x0:x1] = region.astype(np.uint8)
 
 
 def paint(layout_root: layout.LayoutBox, bounds: layout.Rect) -> Canvas:
     """Paint a tree of LayoutBoxes to an array of pixels."""
     display_list = build_display_list(layout_root)
+    # Cull commands that lie entirely outside the viewport before touching
+    # the pixel buffer at all.
+    display_list = [item for item in display_list if _visible(item, bounds)]
+    display_list = _skip_occluded(display_list)
     canvas = Canvas._new(int(bounds.width), int(bounds.height))
     for item in display_list:
         canvas._paint_item(item)
     return canvas
 
+def _visible(item: DisplayCommand, bounds: layout.Rect) -> bool:
+    """Returns True if any part of the command overlaps `bounds`."""
+    if isinstance(item, SolidColor):
+        return _intersects(item.rect, bounds)
+    if isinstance(item, SolidColorBatch):
+        return any(_intersects(rect, bounds) for rect in item.rects)
+    return False
+
+def _skip_occluded(display_list: DisplayList) -> DisplayList:
+    """Drops commands whose rect is fully hidden behind an opaque rect
+    painted later (painter's algorithm, walked back to front).
+
+    Containment is tested against each seen opaque rect individually
+    rather than their union, so the pass stays O(N*K) and only skips
+    provably hidden work. Nested opaque boxes — a background fully inside
+    an opaque child — are the common win.
+    """
+    kept = []
+    opaque: list[layout.Rect] = []
+    for item in reversed(display_list):
+        if isinstance(item, SolidColor):
+            rect = item.rect
+            if any(_contains(o, rect) for o in opaque):
+                continue
+            kept.append(item)
+            if item.color.a == 255:
+                opaque.append(rect)
+        else:
+            # Batches (thin border edges) rarely occlude anything, so they
+            # only participate as occludees: dropped when every rect is
+            # already hidden.
+            if all(any(_contains(o, rect) for o in opaque) for rect in item.rects):
+                continue
+            kept.append(item)
+    kept.reverse()
+    return kept
+
+def _contains(outer: layout.Rect, inner: layout.Rect) -> bool:
+    """Returns True if rect `inner` lies entirely within rect `outer`."""
+    return (inner.x >= outer.x and inner.y >= outer.y
+            and inner.x + inner.width <= outer.x + outer.width
+            and inner.y + inner.height <= outer.y + outer.height)
+
+def _intersects(a: layout.Rect, b: layout.Rect) -> bool:
+    """Returns True if rects `a` and `b` overlap."""
+    return (a.x < b.x + b.width and a.x + a.width > b.x
+            and a.y < b.y + b.height and a.y + a.height > b.y)
+
 def build_display_list(layout_root: layout.LayoutBox) -> DisplayList:
     """Populate display list with all the display commands to render all the elements."""
     lst: DisplayList = []
-    _render_layout_box(lst, layout_root)
+    for layout_box in layout.flatten(layout_root):
+        _render_layout_box(lst, layout_box)
     return lst
 
 def _render_layout_box(lst: DisplayList, layout_box: layout.LayoutBox):
-    """Adds all the display commands to render a Box type element."""
-    _render_background(lst, layout_box)
-    _render_borders(lst, layout_box)
-    for child in layout_box.children:
-        _render_layout_box(lst, child)
-
-def _render_background(lst: DisplayList, layout_box: layout.LayoutBox):
-    """Adds a solid color background to the output image."""
-    color = _get_color(layout_box, "background")
-    if color:
-        lst.append(SolidColor(color, layout_box.dimensions.border_box()))
-
-def _render_borders(lst: DisplayList, layout_box: layout.LayoutBox):
-    """Renders the borders of the Box type element."""
-    color = _get_color(layout_box, "border-color")
+    """Adds all the display commands to render a Box type element.
+
+    Background and borders are emitted in one pass over the box's cached
+    rect and colors rather than two helper calls re-reading the same
+    attribute chains.
+    """
+    border_box = layout_box.border_rect
+
+    background = layout_box.background_color
+    if background:
+        lst.append(SolidColor(background, border_box))
+
+    color = layout_box.border_color
     if color is None:
-        return -1
-
-    d = layout_box.dimensions
-    border_box = d.border_box()
-
-    # Left border
-    lst.append(SolidColor(color, layout.Rect(
-        border_box.x,
-        border_box.y,
-        d.border.left,
-        border_box.height,
-    )))
-
-    # Right border
-    lst.append(SolidColor(color, layout.Rect(
-        border_box.x + border_box.width - d.border.right,
-        border_box.y,
-        d.border.right,
-        border_box.height
-    )))
-
-    # Top border
-    lst.append(SolidColor(color, layout.Rect(
-        border_box.x,
-        border_box.y,
-        border_box.width,
-        d.border.top
-    )))
-
-    # Bottom border
-    lst.append(SolidColor(color, layout.Rect(
-        border_box.x,
-        border_box.y + border_box.height - d.border.bottom,
-        border_box.width,
-        d.border.bottom
-    )))
-
-def _get_color(layout_box: layout.LayoutBox, name: str) -> css.Color | None:
-    """Return the specified color for CSS Property `name`, or None if no color was specified."""
-    if isinstance(layout_box.box_type, (layout.BlockNode, layout.InlineNode)):
-        value = layout_box.box_type.styled_node.value(name)
-        if isinstance(value, css.Value):
-            return value.color
-    return None
-        
\ No newline at end of file
+        return
+
+    border = layout_box.dimensions.border
+    bx, by = border_box.x, border_box.y
+    bw, bh = border_box.width, border_box.height
+
+    # All four edges share one color, so batch them into a single command
+    # instead of allocating four.
+    lst.append(SolidColorBatch(color, [
+        layout.Rect(bx, by, border.left, bh),
+        layout.Rect(bx + bw - border.right, by, border.right, bh),
+        layout.Rect(bx, by, bw, border.top),
+        layout.Rect(bx, by + bh - border.bottom, bw, border.bottom),
+    ]))
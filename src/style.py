@@ -5,23 +5,15 @@ import css
 PropertyMap = dict[str, css.Value]
 
 class Display:
-    """Base class for the display types"""
-    pass
+    """The display types, as plain string constants.
 
-class DisplayBlock(Display):
-    """Type class to display Block elements."""
-    def __repr__(self) -> str:
-        return "DisplayBlock"
-
-class DisplayInline(Display):
-    """Type class to display Inline elements."""
-    def __repr__(self) -> str:
-        return "DisplayInline"
-
-class DisplayNone(Display):
-    """Type class to display no elements."""
-    def __repr__(self) -> str:
-        return "DisplayNone"
+    display() hands back one of these shared strings, so resolving a
+    node's display allocates nothing and consumers compare with a single
+    string (pointer) compare instead of isinstance.
+    """
+    Block = "block"
+    Inline = "inline"
+    Null = "none"
 
 class StyledNode:
     """
@@ -34,97 +26,162 @@ class StyledNode:
         self.node = node
         self.specified_values = specified_values
         self.children = children
+        # The PropertyMap never changes after styling, so resolve display
+        # once here instead of re-checking the keyword on every call.
+        self._display = self._compute_display()
 
     def __repr__(self) -> str:
         return f"StyledNode(node={self.node}, values={self.specified_values}, children={self.children})"
 
     def value(self, name: str) -> css.Value | None:
         """Return the specified value of a property if it exists, otherwise None."""
-        v = self.specified_values.get(name)
+        return self.specified_values.get(name)
 
-        if v:
-            return v
-        else:
-            return None
-    
     def lookup(self, name: str, fallback_name: str, default: css.Value) -> css.Value:
-        """Return the specified value of property `name`, property `fallback_name`if 
+        """Return the specified value of property `name`, property `fallback_name`if
         that doesn't exist, or value `default` if neither does."""
         return self.value(name) or self.value(fallback_name) or default
-    
-    def display(self) -> Display:
-        """The value of the `display` property. Defaults to `Inline`."""
-        value = self.value("display")
-        if value:
-            if value == "block":
-                return DisplayBlock()
-            elif value == "none":
-                return DisplayNone()
-        return DisplayInline()
 
-
-def style_tree(root: dom.Node, stylesheet: css.Stylesheet) -> StyledNode:
-    """Apply a stylesheet to an entire DOM tree, returning a StyledNode tree."""
+    def display(self) -> str:
+        """The value of the `display` property. Defaults to `Inline`."""
+        return self._display
+
+    def _compute_display(self) -> str:
+        value = self.specified_values.get("display")
+        if value is not None:
+            # Compare the keyword, not the Value object — comparing the
+            # object itself to a string can never be true.
+            if value.keyword == "block":
+                return Display.Block
+            elif value.keyword == "none":
+                return Display.Null
+        return Display.Inline
+
+
+def style_tree(root: dom.Node, stylesheet: css.Stylesheet, cache: dict | None = None) -> StyledNode:
+    """Apply a stylesheet to an entire DOM tree, returning a StyledNode tree.
+
+    Walks the DOM with an explicit worklist instead of recursing per node:
+    one pre-order pass flattens the tree into `(parent_idx, node)` records,
+    then a reverse pass builds the StyledNodes bottom-up so each child
+    list is complete before its StyledNode is constructed.
+    """
 
     # Mbrubeck: This finds only the specified values at the moment. Eventually it should be extended
     # to find the computed values too, including inherited values.
     # Nani: I'm lazy
-    specified_values: PropertyMap = {}
-    root_type: dom.NodeType = root.node_type
 
-    if isinstance(root_type, dom.Element):
-        specified_values = _specified_values(root_type, stylesheet)
-    elif isinstance(root, dom.Text):
-        specified_values = {}
+    # One cache lives for the whole walk; elements with identical matching
+    # inputs share their PropertyMap by reference.
+    if cache is None:
+        cache = {}
+
+    # Pass 1: flatten. Siblings are pushed in document order, so among
+    # siblings the later child gets the smaller index.
+    order: list[tuple[int, dom.Node]] = []
+    stack = [(-1, root)]
+    while stack:
+        parent_idx, node = stack.pop()
+        idx = len(order)
+        order.append((parent_idx, node))
+        for child in node.children:
+            stack.append((idx, child))
+
+    # Pass 2: assemble in reverse, which restores document order within
+    # each child list and guarantees children exist before their parent.
+    child_lists: list[list[StyledNode]] = [[] for _ in order]
+    styled: StyledNode | None = None
+    for idx in range(len(order) - 1, -1, -1):
+        parent_idx, node = order[idx]
+        node_type = node.node_type
+        if isinstance(node_type, dom.Element):
+            specified_values = _specified_values(node_type, stylesheet, cache)
+        else:
+            specified_values = {}
+        styled = StyledNode(node, specified_values, child_lists[idx])
+        if parent_idx >= 0:
+            child_lists[parent_idx].append(styled)
 
-    children = [style_tree(child, stylesheet) for child in root.children]
+    return styled
 
-    return StyledNode(root, specified_values, children)
+def _specified_values(elem: dom.Element, stylesheet: css.Stylesheet, cache: dict) -> PropertyMap:
+    """Apply styles to a single element, returning the specified style.
 
-def _specified_values(elem: dom.Element, stylesheet: css.Stylesheet) -> PropertyMap:
-    """Apply styles to a single element, returning the specified style."""
+    Selector matching only looks at tag name, id, and classes, so elements
+    agreeing on all three get the same result; `cache` keys on that triple
+    and returns the previously computed map, which is never mutated
+    downstream.
+    """
 
     # Mbrubeck: TODO: Allow multiple UA/author/user stylesheets, and implement the cascade.
     # Nani: Again, I am too lazy to think about this.
+    key = (elem.tag_name, elem.id(), frozenset(elem.classes()))
+    cached = cache.get(key)
+    if cached is not None:
+        return cached
+
     values = {}
-    rules = _matching_rules(elem, stylesheet)
 
-    rules.sort(key=lambda pair: pair[0])
-    for _, rule in rules:
+    # The triples come back in ascending specificity order already, so
+    # applying them in sequence lets higher-specificity declarations win
+    # without a per-element sort.
+    for _, rule, _ in _matching_rules(elem, stylesheet):
         for declaration in rule.declarations:
             values[declaration.name] = declaration.value
 
+    cache[key] = values
     return values
 
-# A single CSS Rule and the specificity of its most specific matching selector.
-_MatchedRule = tuple[css.Specificity, css.Rule]
+# A matching CSS Rule with the specificity and the selector that matched.
+_MatchedRule = tuple[css.Specificity, css.Rule, css.SimpleSelector]
 
 def _matching_rules(elem: dom.Element, stylesheet: css.Stylesheet) -> list[_MatchedRule]:
-    """Linearly scans all of the rules, returns a list of rules."""
-    return [match for rule in stylesheet.rules if (match := _match_rule(elem, rule))]
-
-def _match_rule(elem: dom.Element, rule: css.Rule) -> _MatchedRule | None:
-    """If `rule` matches `elem`, return a `_MatchedRule`, else return `None`."""
-    for selector in rule.selectors:
-        if _matches(elem, selector):
-            return (selector.specificity(), rule)
-    return None
-
-def _matches(elem: dom.Element, selector: css.Selector) -> bool:
-    """Matches selectors."""
-    if isinstance(selector, css.SimpleSelector):
-        return _matches_simple_selector(elem, selector)
-    return False
-
-def _matches_simple_selector(elem: dom.Element, selector: css.SimpleSelector) -> bool:
-    """Returns true if matched tag/ID/class, else return False."""
-    if selector.tag_name and elem.tag_name != selector.tag_name:
+    """Returns the matching rule triples, ascending by specificity.
+
+    Candidates are gathered from the stylesheet's id/class/tag/universal
+    buckets rather than scanning every rule, then re-sorted by their
+    position in the pre-sorted list to restore cascade order.
+    """
+    # Fetch the element's matching inputs once; classes() re-splits the
+    # class attribute on every call, so it must not run per selector.
+    tag = elem.tag_name
+    elem_id = elem.id()
+    elem_classes = frozenset(elem.classes())
+
+    by_id, by_class, by_tag, universal = stylesheet.rule_index()
+    # Each bucket already proved one selector field matches, so the
+    # per-bucket predicate only tests the remaining ones. Universal and
+    # tag-bucket selectors have nothing else to test at all.
+    matched = list(universal)
+    matched += by_tag.get(tag, _NO_ENTRIES)
+    if elem_id and elem_id in by_id:
+        matched += [e for e in by_id[elem_id]
+                    if _matches_bucketed(tag, elem_id, elem_classes, e[3], "id")]
+    for cls in elem_classes:
+        if cls in by_class:
+            matched += [e for e in by_class[cls]
+                        if _matches_bucketed(tag, elem_id, elem_classes, e[3], "class")]
+    # `order` is unique per entry, so sorting the tuples never falls
+    # through to comparing rules.
+    matched.sort()
+    return [(spec, rule, sel) for _, spec, rule, sel in matched]
+
+_NO_ENTRIES: list = []
+
+def _matches_bucketed(tag: str, elem_id: str | None, elem_classes: frozenset[str],
+                      selector: css.SimpleSelector, matched_field: str) -> bool:
+    """Returns true if the selector matches, skipping the field the rule
+    index bucket already guarantees (`matched_field`)."""
+    if matched_field != "tag" and selector.tag_name and tag != selector.tag_name:
         return False
-    
-    if selector.id and elem.id() != selector.id:
+
+    if matched_field != "id" and selector.id and elem_id != selector.id:
         return False
-    
-    if any(cls not in elem.classes() for cls in selector.class_name):
+
+    # The class bucket only guarantees one class matched; multi-class
+    # selectors still need the full subset test.
+    if (matched_field != "class" or len(selector.class_set) > 1) \
+            and not selector.class_set.issubset(elem_classes):
         return False
-    
+
     return True
\ No newline at end of file